@@ -1,13 +1,24 @@
 import os
 import json
+import argparse
+import asyncio
+import hashlib
 import logging
 from pathlib import Path
-from typing import List, Dict, Any
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
-import requests
-from tqdm import tqdm
+import aiohttp
+import orjson
+from tqdm.asyncio import tqdm_asyncio
 import random
-import time
+
+# Optional exact tokenizer for transcript truncation; falls back to a character estimate
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 # Configure logging
 logging.basicConfig(
@@ -20,8 +31,58 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Request kinds whose responses may be served from the cache. Informational requests are pure
+# text-in/text-out; commands with side effects (e.g. publishing a post) must always reach the API.
+_CACHEABLE_KINDS = frozenset({"informational"})
+
 class TranscriptProcessor:
-    def __init__(self):
+    # Topics for post generation
+    TOPICS = [
+        "industry insights", "professional growth", "innovation", "leadership",
+        "technology trends", "workplace culture", "success stories", "team building",
+        "market analysis", "future predictions", "personal development", 
+        "problem solving", "change management", "strategic thinking"
+    ]
+    
+    # Expected message roles of a training example, in order
+    _REQUIRED_ROLES = ('system', 'user', 'assistant')
+    
+    # System prompts are constant, so their messages are built once and shared by every request
+    _STYLE_FOCUS = """Analyze the following transcript excerpt for the speaker's unique communication style. 
+Focus on:
+1. Syntactical patterns (sentence structure, length, transitions)
+2. Vocabulary choices (technical terms, common phrases, industry terms)
+3. Tone markers (formality, humor, emotional expression)
+4. Engagement patterns (audience interaction, storytelling)
+5. Unique characteristics (signature phrases, explanation style)
+6. Grammar preferences (active/passive voice, contractions)
+7. Content structure (topic introduction, examples, conclusions)
+"""
+    _POSTS_JSON_FORMAT = ('Respond only with a JSON object of the form {"posts": {"<topic>": "<post>", ...}} '
+                          'using the topics exactly as given.')
+    _SYSTEM_ANALYZE = {
+        "role": "system",
+        "content": _STYLE_FOCUS + """
+Then, based on this analysis, generate a social media post that authentically replicates 
+the speaker's voice and style while discussing the requested topic."""
+    }
+    _SYSTEM_ANALYZE_AND_GENERATE = {
+        "role": "system",
+        "content": _STYLE_FOCUS + """
+Then, based on this analysis, generate an authentic social media post for each of the requested
+topics that replicates the speaker's voice and style. Do not include the analysis in your reply.
+""" + _POSTS_JSON_FORMAT
+    }
+    _SYSTEM_GENERATE_POSTS = {
+        "role": "system",
+        "content": """Based on the speaker's analyzed style, generate an authentic social media post for each of the requested topics.
+Maintain their unique voice characteristics, vocabulary preferences, and structural patterns.
+""" + _POSTS_JSON_FORMAT
+    }
+    _SYSTEM_GENERATE_POST_TEMPLATE = """Based on the speaker's analyzed style, generate an authentic social media post about {topic}.
+Maintain their unique voice characteristics, vocabulary preferences, and structural patterns."""
+    
+    def __init__(self, deterministic: bool = False):
         load_dotenv()
         self.xai_api_key = os.getenv('XAI_API_KEY')
         self.xai_api_url = os.getenv('XAI_API_URL')
@@ -29,101 +90,246 @@ class TranscriptProcessor:
         self.output_dir = Path('output')
         self.output_dir.mkdir(exist_ok=True)
         
+        # Content-addressed cache of deterministic API responses, reused across runs
+        self._cache_dir = self.output_dir / '.cache'
+        self._cache_dir.mkdir(exist_ok=True)
+        
+        self.posts_per_transcript = 5
+        
+        # Style signal saturates within a few thousand tokens, so long transcripts are sampled down
+        self.max_transcript_tokens = int(os.getenv('XAI_MAX_TRANSCRIPT_TOKENS', '8000'))
+        # Loaded on first use, since get_encoding may download the encoding file
+        self._encoding = None
+        self._encoding_unavailable = tiktoken is None
+        
+        # Deterministic mode samples at temperature 0 and derives topic choice from the transcript,
+        # so identical transcripts produce identical requests and cached responses never go stale
+        self.deterministic = deterministic
+        self.temperature = 0.0 if deterministic else 0.7
+        self._payload_base = {"model": "grok-beta", "temperature": self.temperature}
+        
         # API rate limiting parameters
         self.max_retries = 3
-        self.retry_delay = 5  # seconds
+        self.retry_base_delay = 1.0  # seconds, doubled on each attempt
+        self.retry_max_delay = 60.0  # seconds
+        self.max_concurrency = int(os.getenv('XAI_MAX_CONCURRENCY', '8'))
+        
+        # Shared HTTP session and request limiter, active only inside client()
+        self._session = None
+        self._sem = None
+        
+        # Open dataset files and per-split example counts, managed by process() while streaming
+        self._split_files = None
+        self._split_counts = None
         
+    @staticmethod
+    def _read_one(file_path: Path) -> Dict[str, Any]:
+        """Read a single transcript file."""
+        return {
+            'filename': file_path.name,
+            'content': file_path.read_text(encoding='utf-8').strip()
+        }
+
     def load_transcripts(self) -> List[Dict[str, Any]]:
         """Load and process all transcript files from the transcripts directory."""
-        transcripts = []
-        
         try:
             transcript_files = list(self.transcripts_dir.glob('*.txt'))
             if not transcript_files:
                 raise FileNotFoundError("No transcript files found in the transcripts directory")
             
-            for file_path in tqdm(transcript_files, desc="Loading transcripts"):
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read().strip()
-                    transcripts.append({
-                        'filename': file_path.name,
-                        'content': content
-                    })
+            # Overlap filesystem latency by reading files on a thread pool
+            with ThreadPoolExecutor(max_workers=min(32, len(transcript_files))) as executor:
+                transcripts = list(executor.map(self._read_one, transcript_files))
                     
-            logger.info(f"Successfully loaded {len(transcripts)} transcript files")
+            logger.info("Successfully loaded %d transcript files", len(transcripts))
             return transcripts
             
         except Exception as e:
-            logger.error(f"Error loading transcripts: {str(e)}")
+            logger.error("Error loading transcripts: %s", e)
             raise
             
-    def analyze_style(self, text: str) -> Dict[str, Any]:
-        """Analyze text style using xAI API with comprehensive style analysis."""
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Compute the wait before the next retry, honoring Retry-After on 429 responses."""
+        if isinstance(error, aiohttp.ClientResponseError) and error.status == 429 and error.headers:
+            retry_after = error.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(self.retry_max_delay, max(0.0, float(retry_after)))
+                except ValueError:
+                    pass  # HTTP-date form, fall back to jittered backoff
+        
+        # Exponential backoff with full jitter to decorrelate concurrent retries
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _cache_key(payload: Dict[str, Any]) -> str:
+        """Derive a deterministic key from the model, messages and sampling parameters."""
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _read_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached response if present."""
+        path = self._cache_dir / f"{key}.json"
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, key: str, response: Dict[str, Any]):
+        """Atomically store a response so concurrent readers never see partial files."""
+        path = self._cache_dir / f"{key}.json"
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(response, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to write cache entry %s: %s", path, e)
+
+    def _evict_cache(self, payload: Dict[str, Any]):
+        """Drop the cached response for a payload, e.g. when its content turned out unusable."""
+        path = self._cache_dir / f"{self._cache_key(payload)}.json"
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Failed to evict cache entry %s: %s", path, e)
+
+    @asynccontextmanager
+    async def client(self):
+        """Open the shared keep-alive session the API methods send their requests through.
+        
+        process() manages this itself; callers using the API methods directly should wrap
+        them in ``async with processor.client():``.
+        """
+        # Cap in-flight requests to stay under the API rate limits
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
         headers = {
             'Authorization': f'Bearer {self.xai_api_key}',
             'Content-Type': 'application/json'
         }
+        async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+            self._session = session
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            try:
+                yield
+            finally:
+                self._session = None
+                self._sem = None
+
+    async def _post_chat_completion(self, payload: Dict[str, Any], action: str,
+                                    kind: Optional[str] = None) -> Dict[str, Any]:
+        """POST a chat completion request, retrying transient failures with backoff.
         
-        # Prepare the messages for detailed style analysis
-        payload = {
-            "model": "grok-beta",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": """Analyze the following transcript excerpt for the speaker's unique communication style. 
-                    Focus on:
-                    1. Syntactical patterns (sentence structure, length, transitions)
-                    2. Vocabulary choices (technical terms, common phrases, industry terms)
-                    3. Tone markers (formality, humor, emotional expression)
-                    4. Engagement patterns (audience interaction, storytelling)
-                    5. Unique characteristics (signature phrases, explanation style)
-                    6. Grammar preferences (active/passive voice, contractions)
-                    7. Content structure (topic introduction, examples, conclusions)
-                    
-                    Then, based on this analysis, generate a social media post that authentically replicates 
-                    the speaker's voice and style while discussing the requested topic."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Transcript to analyze:\n{text}"
-                }
-            ],
-            "temperature": 0.7  # Allow some creativity while maintaining style consistency
-        }
+        Responses are cached only when the caller declares a cacheable request kind;
+        untagged requests always reach the API.
+        """
+        cache_key = self._cache_key(payload)
+        
+        # Only requests tagged with a cacheable kind are admitted to the response cache, and only
+        # when sampling is deterministic: a temperature > 0 reply is not a reproducible answer, and
+        # its randomly sampled topics make the key unlikely to ever repeat
+        use_cache = kind in _CACHEABLE_KINDS and payload.get('temperature') == 0
+        if use_cache:
+            cached = self._read_cache(cache_key)
+            if cached is not None:
+                logger.debug("Cache hit for %s", action)
+                return cached
+        
+        if self._session is None:
+            raise RuntimeError("No active API session; call API methods inside 'async with processor.client():'")
+        
+        # The same key on every attempt lets the server dedupe retried requests
+        headers = {'Idempotency-Key': cache_key}
         
         for attempt in range(self.max_retries):
             try:
-                response = requests.post(
-                    f"{self.xai_api_url}/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
-                
-                logger.debug(f"Response status: {response.status_code}")
-                logger.debug(f"Response content: {response.text}")
+                async with self._sem:
+                    async with self._session.post(
+                        f"{self.xai_api_url}/chat/completions",
+                        headers=headers,
+                        json=payload
+                    ) as response:
+                        logger.debug("Response status: %s", response.status)
+                        # Only materialize the body for logging when debug output is enabled
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("Response content: %s", await response.text())
+                        
+                        response.raise_for_status()
+                        result = await response.json()
                 
-                response.raise_for_status()
-                return response.json()
+                if use_cache:
+                    self._write_cache(cache_key, result)
+                return result
                 
-            except requests.exceptions.RequestException as e:
+            # The session timeout surfaces as a bare asyncio.TimeoutError while reading the body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 if attempt == self.max_retries - 1:
-                    logger.error(f"Failed to analyze style after {self.max_retries} attempts: {str(e)}")
+                    logger.error("Failed to %s after %d attempts: %s", action, self.max_retries, e)
                     raise
-                logger.warning(f"Retry {attempt + 1}/{self.max_retries} after error: {str(e)}")
-                time.sleep(self.retry_delay)
-
-    def generate_training_examples(self, style_analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Generate training examples based on the style analysis."""
-        # Topics for post generation
-        topics = [
-            "industry insights", "professional growth", "innovation", "leadership",
-            "technology trends", "workplace culture", "success stories", "team building",
-            "market analysis", "future predictions", "personal development", 
-            "problem solving", "change management", "strategic thinking"
-        ]
+                delay = self._retry_delay(attempt, e)
+                logger.warning("Retry %d/%d in %.1fs after error: %s", attempt + 1, self.max_retries, delay, e)
+                await asyncio.sleep(delay)
+
+    def _get_encoding(self):
+        """Return the tiktoken encoding, or None if tiktoken is missing or the encoding can't be loaded."""
+        if self._encoding is None and not self._encoding_unavailable:
+            try:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning("Could not load tiktoken encoding, estimating tokens from characters: %s", e)
+                self._encoding_unavailable = True
+        return self._encoding
+
+    def _prepare_text(self, text: str) -> str:
+        """Limit a transcript to the token budget, keeping excerpts from its start, middle and end."""
+        # Every token spans at least one character, so short transcripts never need tokenizing
+        if len(text) <= self.max_transcript_tokens:
+            return text
+        
+        encoding = self._get_encoding()
+        if encoding is not None:
+            units = encoding.encode(text, disallowed_special=())
+            budget = self.max_transcript_tokens
+            decode = encoding.decode
+        else:
+            # Without tiktoken, assume roughly 4 characters per token
+            units = text
+            budget = self.max_transcript_tokens * 4
+            decode = str
+        
+        if len(units) <= budget:
+            return text
         
+        part = budget // 3
+        middle = (len(units) - part) // 2
+        excerpts = [units[:part], units[middle:middle + part], units[len(units) - part:]]
+        return "\n...\n".join(decode(excerpt) for excerpt in excerpts)
+
+    async def analyze_style(self, text: str) -> Dict[str, Any]:
+        """Analyze text style using xAI API with comprehensive style analysis."""
+        # Prepare the messages for detailed style analysis
+        payload = {
+            **self._payload_base,
+            "messages": [
+                self._SYSTEM_ANALYZE,
+                {"role": "user", "content": f"Transcript to analyze:\n{self._prepare_text(text)}"}
+            ]
+        }
+        
+        return await self._post_chat_completion(payload, "analyze style", kind="informational")
+
+    def _sample_topics(self, transcript: Dict[str, Any]) -> List[str]:
+        """Pick the topics to generate posts about for one transcript."""
+        if self.deterministic:
+            # Seed from the content so reruns request (and hit the cache for) the same topics
+            seed = hashlib.sha256(transcript['content'].encode('utf-8')).hexdigest()
+            return random.Random(seed).sample(self.TOPICS, self.posts_per_transcript)
+        return random.sample(self.TOPICS, self.posts_per_transcript)
+
+    def _build_examples(self, topics: List[str], posts: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Wrap generated posts into chat-format training examples."""
         examples = []
-        for topic in random.sample(topics, 5):  # Generate 5 examples per analysis
+        for topic in topics:
             example = {
                 "messages": [
                     {
@@ -136,7 +342,7 @@ class TranscriptProcessor:
                     },
                     {
                         "role": "assistant",
-                        "content": self.generate_post_from_style(style_analysis, topic)
+                        "content": posts[topic]
                     }
                 ]
             }
@@ -144,86 +350,150 @@ class TranscriptProcessor:
         
         return examples
 
-    def generate_post_from_style(self, style_analysis: Dict[str, Any], topic: str) -> str:
-        """Generate a post based on the analyzed style and requested topic."""
-        headers = {
-            'Authorization': f'Bearer {self.xai_api_key}',
-            'Content-Type': 'application/json'
+    @staticmethod
+    def _parse_posts(content: str, topics: List[str]) -> Dict[str, str]:
+        """Extract the topic-keyed posts from a batched response, ignoring anything malformed."""
+        content = content.strip()
+        if content.startswith('```'):
+            # Strip a Markdown code fence around the JSON object
+            content = content.strip('`')
+            if content.startswith('json'):
+                content = content[len('json'):]
+        
+        try:
+            posts = json.loads(content).get('posts', {})
+        except (ValueError, AttributeError):
+            return {}
+        if not isinstance(posts, dict):
+            return {}
+        
+        return {
+            topic: posts[topic] for topic in topics
+            if isinstance(posts.get(topic), str) and posts[topic].strip()
         }
+
+    async def analyze_and_generate(self, text: str, topics: List[str]) -> Dict[str, str]:
+        """Analyze the transcript's style and write the topic posts in a single request.
         
+        Returns only the posts that could be parsed; callers recover missing topics
+        through analyze_style and generate_posts_batch.
+        """
         payload = {
-            "model": "grok-beta",
+            **self._payload_base,
             "messages": [
-                {
-                    "role": "system",
-                    "content": f"""Based on the speaker's analyzed style, generate an authentic social media post about {topic}.
-                    Maintain their unique voice characteristics, vocabulary preferences, and structural patterns."""
-                },
+                self._SYSTEM_ANALYZE_AND_GENERATE,
                 {
                     "role": "user",
-                    "content": f"Style analysis: {json.dumps(style_analysis)}\nTopic: {topic}"
+                    "content": f"Transcript to analyze:\n{self._prepare_text(text)}\nTopics: {json.dumps(topics)}"
                 }
-            ],
-            "temperature": 0.7
+            ]
         }
         
-        response = requests.post(
-            f"{self.xai_api_url}/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()
-        
-        return response.json()['choices'][0]['message']['content']
+        result = await self._post_chat_completion(payload, "analyze style and generate posts", kind="informational")
+        posts = self._parse_posts(result['choices'][0]['message']['content'], topics)
+        if len(posts) < len(topics):
+            # Don't let a malformed reply be replayed from the cache on every rerun
+            self._evict_cache(payload)
+        return posts
 
-    def create_datasets(self, examples: List[Dict[str, Any]]):
-        """Split and save training and validation datasets."""
-        random.shuffle(examples)
-        split_index = int(len(examples) * 0.8)
+    async def generate_posts_batch(self, style_text: str, topics: List[str]) -> Dict[str, str]:
+        """Generate one post per topic in a single request, falling back per topic on parse failures."""
+        payload = {
+            **self._payload_base,
+            "messages": [
+                self._SYSTEM_GENERATE_POSTS,
+                {
+                    "role": "user",
+                    "content": f"Style analysis: {style_text}\nTopics: {json.dumps(topics)}"
+                }
+            ]
+        }
         
-        training_data = examples[:split_index]
-        validation_data = examples[split_index:]
+        result = await self._post_chat_completion(payload, "generate posts", kind="informational")
+        posts = self._parse_posts(result['choices'][0]['message']['content'], topics)
         
-        self._save_jsonl(training_data, self.output_dir / 'training.jsonl')
-        self._save_jsonl(validation_data, self.output_dir / 'validation.jsonl')
+        missing = [topic for topic in topics if topic not in posts]
+        if missing:
+            # Don't let a malformed reply be replayed from the cache on every rerun
+            self._evict_cache(payload)
+            logger.warning("Batched response missing posts for %s; generating them individually", missing)
+            fallback_posts = await asyncio.gather(*[
+                self.generate_post_from_style(style_text, topic) for topic in missing
+            ])
+            posts.update(zip(missing, fallback_posts))
         
-        logger.info(f"Created datasets: {len(training_data)} training examples, "
-                   f"{len(validation_data)} validation examples")
+        return posts
 
-    def _save_jsonl(self, data: List[Dict[str, Any]], filepath: Path):
-        """Save data in JSONL format with validation."""
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                for item in data:
-                    # Validate required fields
-                    if not self._validate_example(item):
-                        logger.warning(f"Skipping invalid example: {item}")
-                        continue
-                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
-                    
-        except Exception as e:
-            logger.error(f"Error saving JSONL file {filepath}: {str(e)}")
-            raise
+    async def generate_post_from_style(self, style_text: str, topic: str) -> str:
+        """Generate a post based on the analyzed style and requested topic."""
+        payload = {
+            **self._payload_base,
+            "messages": [
+                {"role": "system", "content": self._SYSTEM_GENERATE_POST_TEMPLATE.format(topic=topic)},
+                {"role": "user", "content": f"Style analysis: {style_text}\nTopic: {topic}"}
+            ]
+        }
+        
+        result = await self._post_chat_completion(payload, f"generate post about {topic}", kind="informational")
+        return result['choices'][0]['message']['content']
+
+    def _write_example(self, f, item: Dict[str, Any]) -> bool:
+        """Validate and append a single example to an open JSONL file."""
+        # Validate required fields
+        if not self._validate_example(item):
+            logger.warning("Skipping invalid example: %s", item)
+            return False
+        # orjson emits UTF-8 bytes without escaping non-ASCII characters
+        f.write(orjson.dumps(item) + b'\n')
+        return True
+
+    @staticmethod
+    def _split_for(example: Dict[str, Any]) -> int:
+        """Assign an example to training (0) or validation (1) by hashing it, for a stable 80/20 split."""
+        digest = hashlib.sha256(orjson.dumps(example)).digest()
+        return 0 if int.from_bytes(digest[:8], 'big') / 2 ** 64 < 0.8 else 1
+
+    def _stream_examples(self, examples: List[Dict[str, Any]]):
+        """Write examples straight to the training or validation file as they are generated."""
+        for example in examples:
+            split = self._split_for(example)
+            if self._write_example(self._split_files[split], example):
+                self._split_counts[split] += 1
 
     def _validate_example(self, example: Dict[str, Any]) -> bool:
         """Validate the structure of a training example."""
         try:
-            messages = example.get('messages', [])
-            if len(messages) != 3:
+            messages = example.get('messages')
+            if not messages or len(messages) != len(self._REQUIRED_ROLES):
                 return False
                 
-            required_roles = ['system', 'user', 'assistant']
-            for msg, role in zip(messages, required_roles):
+            for msg, role in zip(messages, self._REQUIRED_ROLES):
                 if msg.get('role') != role or 'content' not in msg:
                     return False
                     
             return True
             
         except Exception as e:
-            logger.error(f"Validation error: {str(e)}")
+            logger.error("Validation error: %s", e)
             return False
 
-    def process(self):
+    async def _process_one(self, transcript: Dict[str, Any]):
+        """Analyze a single transcript and stream its training examples to the datasets."""
+        topics = self._sample_topics(transcript)
+        posts = await self.analyze_and_generate(transcript['content'], topics)
+        
+        # Fall back to the two-step analysis for topics the fused response missed
+        missing = [topic for topic in topics if topic not in posts]
+        if missing:
+            logger.warning("Fused response for %s missing posts for %s; falling back to separate style analysis",
+                           transcript['filename'], missing)
+            style_analysis = await self.analyze_style(transcript['content'])
+            style_text = style_analysis['choices'][0]['message']['content']
+            posts.update(await self.generate_posts_batch(style_text, missing))
+        
+        self._stream_examples(self._build_examples(topics, posts))
+
+    async def process(self):
         """Main processing pipeline."""
         try:
             logger.info("Starting transcript processing")
@@ -231,25 +501,59 @@ class TranscriptProcessor:
             # Load transcripts
             transcripts = self.load_transcripts()
             
-            # Analyze style for each transcript
-            all_examples = []
-            for transcript in tqdm(transcripts, desc="Processing transcripts"):
-                style_analysis = self.analyze_style(transcript['content'])
-                examples = self.generate_training_examples(style_analysis)
-                all_examples.extend(examples)
+            # Examples are streamed to temporary files as soon as they are generated instead of
+            # being held in memory; the previous datasets are only replaced once the run succeeds
+            dataset_paths = (self.output_dir / 'training.jsonl', self.output_dir / 'validation.jsonl')
+            tmp_paths = tuple(path.with_name(f"{path.name}.{os.getpid()}.tmp") for path in dataset_paths)
+            try:
+                with open(tmp_paths[0], 'wb') as training_file, open(tmp_paths[1], 'wb') as validation_file:
+                    # Analyze all transcripts concurrently over a single keep-alive session
+                    async with self.client():
+                        self._split_files = (training_file, validation_file)
+                        self._split_counts = [0, 0]
+                        tasks = [asyncio.ensure_future(self._process_one(transcript)) for transcript in transcripts]
+                        try:
+                            # A single progress bar that advances as each transcript's task completes
+                            for next_done in tqdm_asyncio.as_completed(tasks, desc="Processing transcripts"):
+                                await next_done
+                            training_count, validation_count = self._split_counts
+                        finally:
+                            # Stop the remaining transcripts on the first failure rather than paying for
+                            # work that will be discarded, and retrieve every task's outcome
+                            for task in tasks:
+                                task.cancel()
+                            await asyncio.gather(*tasks, return_exceptions=True)
+                            self._split_files = None
+                            self._split_counts = None
+                
+                for tmp_path, path in zip(tmp_paths, dataset_paths):
+                    os.replace(tmp_path, path)
+            finally:
+                for tmp_path in tmp_paths:
+                    if tmp_path.exists():
+                        tmp_path.unlink()
             
-            # Create and save datasets
-            self.create_datasets(all_examples)
+            logger.info("Created datasets: %d training examples, %d validation examples",
+                        training_count, validation_count)
             
             logger.info("Processing completed successfully")
             
         except Exception as e:
-            logger.error(f"Processing failed: {str(e)}")
+            logger.error("Processing failed: %s", e)
             raise
 
 def main():
-    processor = TranscriptProcessor()
-    processor.process()
+    parser = argparse.ArgumentParser(description="Generate style-matched training data from transcripts.")
+    parser.add_argument(
+        '--deterministic',
+        action='store_true',
+        help="Sample with temperature 0 and pick topics from each transcript's content, "
+             "so reruns on unchanged transcripts are served from the response cache"
+    )
+    args = parser.parse_args()
+    
+    processor = TranscriptProcessor(deterministic=args.deterministic)
+    asyncio.run(processor.process())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file